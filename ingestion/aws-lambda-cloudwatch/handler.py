@@ -1,27 +1,44 @@
 # Minimal AWS Lambda forwarder for CloudWatch Logs -> POST /logs
-import os, json, base64, gzip, urllib.request
+import os, json, base64, gzip
+import urllib3
+
+# orjson parses large CloudWatch payloads ~3x faster than stdlib json;
+# fall back if the Lambda bundle doesn't include it
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 API_URL = os.environ.get("API_URL", "http://<api-host>:8080/logs")
 INGEST_TOKEN = os.environ.get("INGEST_TOKEN")
 
+# Module-level pool survives warm Lambda invocations, so the TCP/TLS
+# handshake is paid once per container instead of once per log event.
+POOL = urllib3.PoolManager(num_pools=1, maxsize=4, retries=False)
+
 
 def handler(event, context):
-    data = gzip.decompress(base64.b64decode(event["awslogs"]["data"]))
-    parsed = json.loads(data)
+    # Single expression so the base64 and gzip intermediates are freed
+    # as soon as parsing is done, keeping peak memory to one copy
+    parsed = _loads(gzip.decompress(base64.b64decode(event["awslogs"]["data"])))
     log_group = parsed.get("logGroup", "cloudwatch")
+    log_events = parsed.get("logEvents", [])
 
     headers = {"Content-Type": "application/json"}
     if INGEST_TOKEN:
         headers["X-Ingest-Token"] = INGEST_TOKEN
 
-    for e in parsed.get("logEvents", []):
+    if log_events:
         body = json.dumps({
             "serviceName": log_group,
-            "message": e.get("message", "")
+            "events": [{"message": e.get("message", "")} for e in log_events]
         }).encode("utf-8")
-        req = urllib.request.Request(API_URL, data=body, headers=headers, method="POST")
+        if len(body) > 1024:
+            body = gzip.compress(body, 1)
+            headers["Content-Encoding"] = "gzip"
         try:
-            urllib.request.urlopen(req, timeout=3)
+            POOL.request("POST", API_URL, body=body, headers=headers, timeout=3)
         except Exception:
             pass
-    return {"status": "ok", "events": len(parsed.get("logEvents", []))}
+    return {"status": "ok", "events": len(log_events)}
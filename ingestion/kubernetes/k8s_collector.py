@@ -3,7 +3,11 @@ Kubernetes Log Collector
 Streams logs from Kubernetes pods and forwards to the Log Anomaly Detector API
 """
 from kubernetes import client, config, watch
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import gzip
+import httpx
+import orjson
 import threading
 import time
 import os
@@ -12,16 +16,51 @@ API_URL = os.environ.get("API_URL", "http://localhost:8080/logs")
 INGEST_TOKEN = os.environ.get("INGEST_TOKEN")
 NAMESPACE = os.environ.get("NAMESPACE", "default")
 LABEL_SELECTOR = os.environ.get("LABEL_SELECTOR", "")
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "50"))
+
+# Gzip bodies above this size; level 1 compresses JSON logs ~5-10x at
+# negligible CPU cost
+GZIP_MIN_BYTES = int(os.environ.get("INGEST_GZIP_MIN_BYTES", "512"))
+GZIP_LEVEL = int(os.environ.get("INGEST_GZIP_LEVEL", "1"))
+
+# Process-wide Kubernetes ApiClient: every API object shares one urllib3
+# connection pool instead of each constructing its own
+API_CLIENT = None
+
+def get_api_client():
+    """Return the shared Kubernetes ApiClient, creating it on first use.
+
+    Must be called after kube config has been loaded.
+    """
+    global API_CLIENT
+    if API_CLIENT is None:
+        API_CLIENT = client.ApiClient()
+    return API_CLIENT
+
+# One pooled client shared by all collector threads: keep-alive connections
+# avoid a fresh TCP/TLS handshake per log line
+CLIENT = httpx.Client(
+    headers={"Content-Type": "application/json", **({"X-Ingest-Token": INGEST_TOKEN} if INGEST_TOKEN else {})},
+    timeout=2.0,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32)
+)
+atexit.register(CLIENT.close)
+
+def post_json(payload):
+    """POST a JSON payload to the API, gzipping bodies over the threshold"""
+    body = orjson.dumps(payload)
+    headers = None
+    if len(body) > GZIP_MIN_BYTES:
+        body = gzip.compress(body, GZIP_LEVEL)
+        headers = {"Content-Encoding": "gzip"}
+    return CLIENT.post(API_URL, content=body, headers=headers)
 
 def collect_logs_from_pod(v1, pod_name, namespace, container_name):
     """Stream logs from a single pod/container and forward to API"""
     service_name = f"{namespace}/{pod_name}/{container_name}"
     print(f"[INFO] Starting log collection for: {service_name}")
-    
-    headers = {"Content-Type": "application/json"}
-    if INGEST_TOKEN:
-        headers["X-Ingest-Token"] = INGEST_TOKEN
-    
+
     try:
         w = watch.Watch()
         for log_line in w.stream(
@@ -39,7 +78,7 @@ def collect_logs_from_pod(v1, pod_name, namespace, container_name):
                     "message": log_message
                 }
                 try:
-                    response = requests.post(API_URL, json=payload, headers=headers, timeout=2)
+                    response = post_json(payload)
                     if response.status_code != 200:
                         print(f"[WARN] [{service_name}] API returned {response.status_code}")
                 except Exception as e:
@@ -56,7 +95,7 @@ def main():
         config.load_kube_config()  # Running outside cluster
         print("[INFO] Using kubeconfig file")
     
-    v1 = client.CoreV1Api()
+    v1 = client.CoreV1Api(get_api_client())
     
     print("=" * 60)
     print("Kubernetes Log Collector for Log Anomaly Detector")
@@ -67,37 +106,55 @@ def main():
     print(f"Auth Token: {'Configured' if INGEST_TOKEN else 'Not set'}")
     print("=" * 60)
     
-    # Get pods
-    if LABEL_SELECTOR:
-        pods = v1.list_namespaced_pod(namespace=NAMESPACE, label_selector=LABEL_SELECTOR)
-    else:
-        pods = v1.list_namespaced_pod(namespace=NAMESPACE)
-    
-    print(f"\nFound {len(pods.items)} pod(s):")
-    
-    threads = []
-    for pod in pods.items:
+    # Bounded pool caps concurrent streams so large clusters don't spawn
+    # one thread (and one burst of TLS handshakes) per container at once
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    # Containers with a live (or pending) log stream
+    active = set()
+    active_lock = threading.Lock()
+
+    def stream_and_release(pod_name, container_name):
+        try:
+            collect_logs_from_pod(v1, pod_name, NAMESPACE, container_name)
+        finally:
+            # Stream ended: allow a restarted pod to get a fresh stream
+            with active_lock:
+                active.discard((pod_name, container_name))
+
+    def dispatch(event_type, pod):
         pod_name = pod.metadata.name
         for container in pod.spec.containers:
-            container_name = container.name
-            print(f"  ✓ {pod_name}/{container_name}")
-            
-            thread = threading.Thread(
-                target=collect_logs_from_pod,
-                args=(v1, pod_name, NAMESPACE, container_name),
-                daemon=True
-            )
-            thread.start()
-            threads.append(thread)
-    
-    print("=" * 60)
-    
-    # Keep main thread alive
+            key = (pod_name, container.name)
+            if event_type in ("ADDED", "MODIFIED"):
+                with active_lock:
+                    if key in active:
+                        continue
+                    active.add(key)
+                print(f"  ✓ {pod_name}/{container.name}")
+                executor.submit(stream_and_release, pod_name, container.name)
+            elif event_type == "DELETED":
+                with active_lock:
+                    active.discard(key)
+
+    # Watch pods instead of listing once: one persistent stream picks up
+    # new pods as they appear, with no periodic full re-list
+    watch_kwargs = {"namespace": NAMESPACE}
+    if LABEL_SELECTOR:
+        watch_kwargs["label_selector"] = LABEL_SELECTOR
+
     try:
         while True:
+            try:
+                for event in watch.Watch().stream(v1.list_namespaced_pod, **watch_kwargs):
+                    dispatch(event["type"], event["object"])
+            except Exception as e:
+                print(f"[WARN] Pod watch ended: {e}. Restarting...")
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n[INFO] Stopping log collector...")
+        # Stream workers block in long reads; exit without joining them
+        os._exit(0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+"""
+Gunicorn configuration for the ML Analyzer service.
+
+preload_app loads the Flask app (and therefore the IsolationForest
+model) once in the master process before forking, so worker processes
+share the model pages copy-on-write instead of each deserializing it.
+"""
+import os
+
+bind = "0.0.0.0:5001"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 4))
+threads = int(os.environ.get("GUNICORN_THREADS", "2"))
@@ -1,10 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, Response
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
-from collections import Counter
 import numpy as np
+import orjson
 import joblib
 import logging
+import xxhash
+import os
+import queue
+import re
+import threading
 import time
 from pathlib import Path
 
@@ -17,6 +22,10 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+def _json_response(payload, status: int = 200):
+    """Serialize a response with orjson (C-speed) instead of jsonify."""
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+
 # Model version for API responses
 MODEL_VERSION = "1.0.0"
 
@@ -26,8 +35,22 @@ MODEL_PATH = MODELS_DIR / "isolation_forest_model.joblib"
 SCALER_PATH = MODELS_DIR / "scaler.joblib"
 VOCAB_PATH = MODELS_DIR / "vocabulary.joblib"
 
-# Global vocabulary for rare word detection
-word_frequency = Counter()
+# Global vocabulary for rare word detection, with a running total so the
+# average frequency doesn't have to be recomputed on every request
+word_frequency = {}
+total_frequency = 0
+
+# Severity keyword classes (0-10 scale), highest first. Precompiled
+# alternations give one C-level scan per class instead of one substring
+# search per keyword. Prefixes cover their variants (warn/warning,
+# retry/retrying, abort/aborted, throttle/throttled).
+SEVERITY_PATTERNS = [
+    (10, re.compile(r"critical|fatal|panic|crashed|abort|killed|segfault|core dump")),   # Critical
+    (8, re.compile(r"error|exception|failed|failure|rejected|denied|invalid|forbidden|unauthorized")),  # Severe
+    (6, re.compile(r"timeout|unavailable|refused|connection|unreachable|deadlock|conflict|corrupt")),   # High
+    (4, re.compile(r"warn|retry|degraded|throttle")),                                    # Medium
+    (2, re.compile(r"deprecated|slow|delay|latency")),                                   # Low
+]
 
 # --- Training with more realistic feature ranges and scaling ---
 # Features we will use:
@@ -37,42 +60,64 @@ word_frequency = Counter()
 # 3) digit ratio in message (0-1)
 
 def _update_vocabulary(message: str):
-    """Update word frequency counter for rare word detection."""
+    """Update word frequency counts for rare word detection."""
+    global total_frequency
     words = message.lower().split()
-    word_frequency.update(words)
+    for word in words:
+        word_frequency[word] = word_frequency.get(word, 0) + 1
+    total_frequency += len(words)
+
+# Vocabulary updates run off the request path: predict enqueues the raw
+# message and a worker thread applies the dict updates in the background
+VOCAB_QUEUE = queue.SimpleQueue()
+_vocab_worker_pid = None
+_vocab_worker_lock = threading.Lock()
+
+def _vocab_worker():
+    while True:
+        _update_vocabulary(VOCAB_QUEUE.get())
+
+def _queue_vocab_update(message: str):
+    """Enqueue a vocabulary update, starting the consumer on first use.
+
+    The worker thread is started lazily and guarded by PID rather than
+    at import time: under gunicorn's preload_app the module is imported
+    once in the master, and threads don't survive fork, so an
+    import-time worker would leave every forked worker process with a
+    growing queue and a frozen vocabulary.
+    """
+    global _vocab_worker_pid
+    if _vocab_worker_pid != os.getpid():
+        with _vocab_worker_lock:
+            if _vocab_worker_pid != os.getpid():
+                threading.Thread(target=_vocab_worker, daemon=True).start()
+                _vocab_worker_pid = os.getpid()
+    VOCAB_QUEUE.put(message)
 
 def _get_rare_word_score(message: str) -> float:
     """
     Calculate rare word score based on vocabulary frequency.
     Higher score = more rare/unusual words.
-    
+
     Returns:
         float: Rare word score (0-10)
     """
     if not word_frequency:
         return 0.0
-    
+
     words = message.lower().split()
     if not words:
         return 0.0
-    
-    # Calculate average rarity of words
-    total_messages = sum(word_frequency.values()) / len(word_frequency) if word_frequency else 1
-    rarities = []
-    
-    for word in words:
-        freq = word_frequency.get(word, 0)
-        if freq == 0:
-            # Completely new word - very rare
-            rarities.append(10.0)
-        else:
-            # Normalize frequency to 0-10 scale (inverse)
-            # Common words (high freq) → low score
-            # Rare words (low freq) → high score
-            rarity = max(0, 10 - (freq / total_messages * 100))
-            rarities.append(rarity)
-    
-    return np.mean(rarities) if rarities else 0.0
+
+    # Average word frequency, maintained incrementally by _update_vocabulary
+    avg_frequency = total_frequency / len(word_frequency)
+
+    # Vectorized rarity: completely new words are maximally rare; known
+    # words score inversely with frequency on a 0-10 scale
+    freqs = np.fromiter((word_frequency.get(w, 0) for w in words), dtype=np.float32, count=len(words))
+    rarities = np.where(freqs == 0, 10.0, np.clip(10.0 - freqs / avg_frequency * 100.0, 0.0, 10.0))
+
+    return float(rarities.mean())
 
 def _featurize(message: str, service: str) -> np.ndarray:
     """
@@ -86,36 +131,30 @@ def _featurize(message: str, service: str) -> np.ndarray:
         numpy array of features: [length, service_hash, error_severity, digit_ratio, word_count, rare_word_score]
     """
     length = len(message)
-    svc_hash = hash(service) % 1000
+    # Stable hash: CPython's hash() is salted per process, which would
+    # put the same service in different buckets across gunicorn workers
+    svc_hash = xxhash.xxh3_64_intdigest(service.encode("utf-8")) % 1000
     lower = message.lower()
     
     # Comprehensive error severity scoring (0-10 scale)
     error_severity = 0
+    for severity, pattern in SEVERITY_PATTERNS:
+        if pattern.search(lower):
+            error_severity = severity
+            break
     
-    # Critical (10)
-    if any(k in lower for k in ["critical", "fatal", "panic", "crashed", "abort", "aborted", "killed", "segfault", "core dump"]):
-        error_severity = 10
-    # Severe (8)
-    elif any(k in lower for k in ["error", "exception", "failed", "failure", "rejected", "denied", "invalid", "forbidden", "unauthorized"]):
-        error_severity = 8
-    # High (6)
-    elif any(k in lower for k in ["timeout", "unavailable", "refused", "connection", "unreachable", "deadlock", "conflict", "corrupt"]):
-        error_severity = 6
-    # Medium (4)
-    elif any(k in lower for k in ["warning", "warn", "retry", "retrying", "degraded", "throttle", "throttled"]):
-        error_severity = 4
-    # Low (2)
-    elif any(k in lower for k in ["deprecated", "slow", "delay", "latency"]):
-        error_severity = 2
-    
-    digits = sum(ch.isdigit() for ch in message)
+    # Count ASCII digits over the raw bytes in one numpy pass instead of
+    # a per-character Python loop (UTF-8 continuation bytes are >= 0x80,
+    # so they can never match the digit range)
+    raw = np.frombuffer(message.encode("utf-8", "replace"), dtype=np.uint8)
+    digits = int(((raw >= 0x30) & (raw <= 0x39)).sum())
     digit_ratio = (digits / max(1, length)) if length > 0 else 0.0
     word_count = len(message.split())
     
     # Rare word detection score
     rare_word_score = _get_rare_word_score(message)
-    
-    return np.array([length, svc_hash, error_severity, digit_ratio, word_count, rare_word_score], dtype=float)
+
+    return np.array([length, svc_hash, error_severity, digit_ratio, word_count, rare_word_score], dtype=np.float32)
 
 def _train_model():
     """
@@ -146,16 +185,21 @@ def _train_model():
     anomaly_word_count = rng.integers(5, 30, size=anomaly_size)
     anomaly_rare_score = rng.uniform(5.0, 10.0, size=anomaly_size)  # High rarity for anomalies
     
-    # Combine normal and anomalous data
-    lengths = np.concatenate([normal_lengths, anomaly_lengths])
-    svc = np.concatenate([normal_svc, anomaly_svc])
-    severity = np.concatenate([normal_severity, anomaly_severity])
-    digit_ratio = np.concatenate([normal_digit_ratio, anomaly_digit_ratio])
-    word_count = np.concatenate([normal_word_count, anomaly_word_count])
-    rare_score = np.concatenate([normal_rare_score, anomaly_rare_score])
-    
-    train = np.column_stack([lengths, svc, severity, digit_ratio, word_count, rare_score]).astype(float)
-    
+    # Fill one preallocated matrix column by column instead of
+    # materializing a dozen concatenate/column_stack temporaries
+    train = np.empty((normal_size + anomaly_size, 6), dtype=np.float64)
+    columns = [
+        (normal_lengths, anomaly_lengths),
+        (normal_svc, anomaly_svc),
+        (normal_severity, anomaly_severity),
+        (normal_digit_ratio, anomaly_digit_ratio),
+        (normal_word_count, anomaly_word_count),
+        (normal_rare_score, anomaly_rare_score),
+    ]
+    for col, (normal_part, anomaly_part) in enumerate(columns):
+        train[:normal_size, col] = normal_part
+        train[normal_size:, col] = anomaly_part
+
     scaler = StandardScaler()
     train_scaled = scaler.fit_transform(train)
     model = IsolationForest(contamination=0.2, random_state=42)  # Expect 20% anomalies
@@ -163,6 +207,18 @@ def _train_model():
     logger.info("Model training completed successfully")
     return model, scaler
 
+def _persist(obj, path: Path):
+    """
+    Atomically persist an object to disk with fast lz4 compression.
+
+    Writes to a temporary file and renames it into place so a crash
+    mid-dump never leaves a truncated model behind. lz4 level 1 is
+    chosen for its cheap decompression on container cold start.
+    """
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    joblib.dump(obj, tmp_path, compress=("lz4", 1))
+    os.replace(tmp_path, path)
+
 def _load_model():
     """
     Load persisted model, scaler, and vocabulary from disk, or train new ones if not found.
@@ -170,8 +226,8 @@ def _load_model():
     Returns:
         tuple: (model, scaler) IsolationForest and StandardScaler
     """
-    global word_frequency
-    
+    global word_frequency, total_frequency
+
     # Ensure models directory exists
     MODELS_DIR.mkdir(exist_ok=True)
     
@@ -186,7 +242,8 @@ def _load_model():
             # Load vocabulary if exists
             if VOCAB_PATH.exists():
                 logger.info(f"Loading vocabulary from {VOCAB_PATH}")
-                word_frequency = joblib.load(VOCAB_PATH)
+                word_frequency = dict(joblib.load(VOCAB_PATH))
+                total_frequency = sum(word_frequency.values())
             
             logger.info("Model and scaler loaded successfully")
             return model, scaler
@@ -199,20 +256,37 @@ def _load_model():
     # Save the newly trained model
     try:
         logger.info(f"Saving model to {MODEL_PATH}")
-        joblib.dump(model, MODEL_PATH)
+        _persist(model, MODEL_PATH)
         logger.info(f"Saving scaler to {SCALER_PATH}")
-        joblib.dump(scaler, SCALER_PATH)
+        _persist(scaler, SCALER_PATH)
         logger.info(f"Saving vocabulary to {VOCAB_PATH}")
-        joblib.dump(word_frequency, VOCAB_PATH)
+        _persist(word_frequency, VOCAB_PATH)
         logger.info("Model, scaler, and vocabulary saved successfully")
     except Exception as e:
         logger.error(f"Failed to save model: {e}")
     
     return model, scaler
 
+# Scaler folded into precomputed float32 vectors: the hot path does one
+# subtract-multiply instead of a full sklearn transform, and float32
+# halves the bytes moved through scaling and the tree walk
+SCALER_MEAN = None
+SCALER_INV_SCALE = None
+
+def _set_scaler_params(fitted_scaler):
+    """Precompute mean and inverse scale from a fitted StandardScaler."""
+    global SCALER_MEAN, SCALER_INV_SCALE
+    SCALER_MEAN = fitted_scaler.mean_.astype(np.float32)
+    SCALER_INV_SCALE = (1.0 / fitted_scaler.scale_).astype(np.float32)
+
+def _scale(features: np.ndarray) -> np.ndarray:
+    """Apply the fitted StandardScaler as a fused subtract-multiply."""
+    return (features - SCALER_MEAN) * SCALER_INV_SCALE
+
 # Load or train model on startup
 logger.info("Initializing ML Analyzer...")
 model, scaler = _load_model()
+_set_scaler_params(scaler)
 logger.info("ML Analyzer ready")
 
 @app.route("/predict", methods=["POST"])
@@ -235,12 +309,16 @@ def predict():
         # Input validation
         if not request.is_json:
             logger.warning("Request is not JSON")
-            return jsonify({"error": "Content-Type must be application/json"}), 400
+            return _json_response({"error": "Content-Type must be application/json"}, 400)
         
-        data = request.get_json()
-        if data is None:
-            logger.warning("Request body is empty")
-            return jsonify({"error": "Request body cannot be empty"}), 400
+        try:
+            data = orjson.loads(request.get_data() or b"{}")
+        except orjson.JSONDecodeError:
+            logger.warning("Request body is not valid JSON")
+            return _json_response({"error": "Request body must be valid JSON"}, 400)
+        if not isinstance(data, dict):
+            logger.warning("Request body is not a JSON object")
+            return _json_response({"error": "Request body must be a JSON object"}, 400)
         
         message = data.get("message", "")
         service = data.get("serviceName", "")
@@ -248,24 +326,22 @@ def predict():
         # Validate required fields
         if not message or not isinstance(message, str):
             logger.warning(f"Invalid message field: {message}")
-            return jsonify({"error": "Field 'message' is required and must be a non-empty string"}), 400
+            return _json_response({"error": "Field 'message' is required and must be a non-empty string"}, 400)
         
         if not service or not isinstance(service, str):
             logger.warning(f"Invalid serviceName field: {service}")
-            return jsonify({"error": "Field 'serviceName' is required and must be a non-empty string"}), 400
+            return _json_response({"error": "Field 'serviceName' is required and must be a non-empty string"}, 400)
         
         logger.info(f"Processing prediction request for service: {service}, message length: {len(message)}")
         
-        # Update vocabulary with this message for rare word detection
-        _update_vocabulary(message)
-        
         # Build features and scale
         features = _featurize(message, service).reshape(1, -1)
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]  # 1 = normal, -1 = anomaly
+        features_scaled = _scale(features)
+        # decision_function is offset-adjusted, so predict() would just
+        # re-walk the trees and threshold the same score at 0
         score = float(model.decision_function(features_scaled)[0])  # higher => more normal
-        
-        is_anomaly = bool(prediction == -1)
+
+        is_anomaly = bool(score < 0.0)
         latency_ms = (time.time() - start_time) * 1000
         
         result = {
@@ -275,24 +351,102 @@ def predict():
             "score": score,
             "modelVersion": MODEL_VERSION
         }
-        
+
+        # Queue the vocabulary update for the background worker; scoring
+        # above used the current frequency snapshot
+        _queue_vocab_update(message)
+
         logger.info(f"Prediction completed: isAnomaly={is_anomaly}, score={score:.4f}, latency={latency_ms:.2f}ms")
-        return jsonify(result), 200
+        return _json_response(result, 200)
 
     except Exception as e:
         latency_ms = (time.time() - start_time) * 1000
         logger.error(f"Error processing prediction request: {str(e)}, latency={latency_ms:.2f}ms", exc_info=True)
-        return jsonify({"error": str(e), "modelVersion": MODEL_VERSION}), 500
+        return _json_response({"error": str(e), "modelVersion": MODEL_VERSION}, 500)
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """
+    Predict anomalies for a batch of log entries in one model call.
+
+    Expected JSON body:
+    [
+        {"serviceName": "string", "message": "string"},
+        ...
+    ]
+
+    Returns:
+        JSON array with one result per entry, in input order.
+    """
+    start_time = time.time()
+
+    try:
+        if not request.is_json:
+            logger.warning("Request is not JSON")
+            return _json_response({"error": "Content-Type must be application/json"}, 400)
+
+        try:
+            batch = orjson.loads(request.get_data() or b"[]")
+        except orjson.JSONDecodeError:
+            logger.warning("Batch request body is not valid JSON")
+            return _json_response({"error": "Request body must be valid JSON"}, 400)
+        if not isinstance(batch, list) or not batch:
+            logger.warning("Batch request body is not a non-empty array")
+            return _json_response({"error": "Request body must be a non-empty JSON array"}, 400)
+
+        entries = []
+        for i, entry in enumerate(batch):
+            if not isinstance(entry, dict):
+                return _json_response({"error": f"Entry {i} must be an object"}, 400)
+            message = entry.get("message", "")
+            service = entry.get("serviceName", "")
+            if not message or not isinstance(message, str):
+                return _json_response({"error": f"Entry {i}: field 'message' is required and must be a non-empty string"}, 400)
+            if not service or not isinstance(service, str):
+                return _json_response({"error": f"Entry {i}: field 'serviceName' is required and must be a non-empty string"}, 400)
+            entries.append((message, service))
+
+        logger.info(f"Processing batch prediction request with {len(entries)} entries")
+
+        # Featurize the whole batch and run scaler + model once: sklearn's
+        # per-call overhead is amortized over all N entries
+        features = np.vstack([_featurize(m, s) for m, s in entries])
+        features_scaled = _scale(features)
+        scores = model.decision_function(features_scaled)
+
+        results = [
+            {
+                "service": service,
+                "message": message,
+                "isAnomaly": bool(scores[i] < 0.0),
+                "score": float(scores[i]),
+                "modelVersion": MODEL_VERSION
+            }
+            for i, (message, service) in enumerate(entries)
+        ]
+
+        # Queue vocabulary updates for the background worker
+        for message, _ in entries:
+            _queue_vocab_update(message)
+
+        latency_ms = (time.time() - start_time) * 1000
+        logger.info(f"Batch prediction completed: {len(results)} entries, latency={latency_ms:.2f}ms")
+        return _json_response(results, 200)
+
+    except Exception as e:
+        latency_ms = (time.time() - start_time) * 1000
+        logger.error(f"Error processing batch prediction request: {str(e)}, latency={latency_ms:.2f}ms", exc_info=True)
+        return _json_response({"error": str(e), "modelVersion": MODEL_VERSION}, 500)
 
 @app.route("/", methods=["GET"])
 def index():
     """Root endpoint - service information."""
     logger.info("Root endpoint accessed")
-    return jsonify({
+    return _json_response({
         "service": "ML Anomaly Detection Service",
         "status": "running",
         "version": MODEL_VERSION
-    }), 200
+    }, 200)
 
 @app.route("/health", methods=["GET"])
 def health():
@@ -304,21 +458,22 @@ def health():
         logger.debug("Health check requested")
         # Basic check that model exists and can score
         # Features: [length, service_hash, error_severity, digit_ratio, word_count, rare_word_score]
-        test_features = [[100.0, 500.0, 0.0, 0.05, 5.0, 0.0]]
-        _ = float(model.decision_function(scaler.transform(test_features))[0])
+        test_features = np.array([[100.0, 500.0, 0.0, 0.05, 5.0, 0.0]], dtype=np.float32)
+        _ = float(model.decision_function(_scale(test_features))[0])
         logger.debug("Health check passed")
-        return jsonify({
+        return _json_response({
             "status": "up",
             "modelVersion": MODEL_VERSION,
             "modelLoaded": True
-        }), 200
+        }, 200)
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}", exc_info=True)
-        return jsonify({
+        return _json_response({
             "status": "down",
             "error": str(e),
             "modelVersion": MODEL_VERSION
-        }), 500
+        }, 500)
 
 if __name__ == "__main__":
+    # Development only; production serves via gunicorn (see gunicorn.conf.py)
     app.run(host="0.0.0.0", port=5001)
@@ -244,6 +244,77 @@ class TestPredictEndpoint:
         assert 'error' in data
 
 
+class TestPredictBatchEndpoint:
+    """Tests for the /predict_batch endpoint."""
+
+    def test_predict_batch_valid_request(self, client):
+        """Test batch prediction with valid input returns one result per entry."""
+        payload = [
+            {'serviceName': 'auth-service', 'message': 'User logged in'},
+            {'serviceName': 'payment-service', 'message': 'Error: payment gateway timeout'},
+            {'serviceName': 'order-service', 'message': 'Order 12345 created'}
+        ]
+        response = client.post(
+            '/predict_batch',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert isinstance(data, list)
+        assert len(data) == 3
+
+        for i, result in enumerate(data):
+            assert result['service'] == payload[i]['serviceName']
+            assert result['message'] == payload[i]['message']
+            assert isinstance(result['isAnomaly'], bool)
+            assert isinstance(result['score'], (int, float))
+            assert result['modelVersion'] == '1.0.0'
+
+    def test_predict_batch_empty_array(self, client):
+        """Test batch prediction with an empty array."""
+        response = client.post(
+            '/predict_batch',
+            data=json.dumps([]),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+
+    def test_predict_batch_not_an_array(self, client):
+        """Test batch prediction with a single object instead of an array."""
+        payload = {'serviceName': 'test', 'message': 'test message'}
+        response = client.post(
+            '/predict_batch',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+
+    def test_predict_batch_invalid_entry(self, client):
+        """Test batch prediction with a missing message in one entry."""
+        payload = [
+            {'serviceName': 'test', 'message': 'valid message'},
+            {'serviceName': 'test'}
+        ]
+        response = client.post(
+            '/predict_batch',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+        assert 'message' in data['error'].lower()
+
+
 class TestResponseFormat:
     """Tests for response format consistency."""
     
@@ -1,8 +1,16 @@
+import os
+import orjson
 import requests
 import random
 import time
 
-BASE_URL = "http://localhost:8080/logs"
+BASE_URL = os.environ.get("API_URL", "http://localhost:8080/logs")
+RATE = float(os.environ.get("RATE", "10"))  # logs per second
+
+# Reused session keeps the connection alive so each send is one request,
+# not a fresh TCP handshake
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
 
 services = ["auth-service", "payment-service", "user-service", "order-service"]
 
@@ -17,16 +25,21 @@ messages = [
     "Session expired"
 ]
 
+# Services and messages are fixed, so every possible body is encoded to
+# bytes once up front; the send loop just picks one and POSTs it
+PAYLOADS = [
+    orjson.dumps({"serviceName": s, "message": m})
+    for s in services
+    for m in messages
+]
+
 while True:
-    log_data = {
-        "serviceName": random.choice(services),
-        "message": random.choice(messages)
-    }
+    payload = random.choice(PAYLOADS)
 
     try:
-        response = requests.post(BASE_URL, json=log_data)
-        print(f"Sent: {log_data} | Status: {response.status_code}")
+        response = SESSION.post(BASE_URL, data=payload)
+        print(f"Sent: {payload.decode()} | Status: {response.status_code}")
     except Exception as e:
         print(f"Error sending log: {e}")
 
-    time.sleep(random.uniform(1, 5))  # send every 1–5 seconds
+    time.sleep(1.0 / RATE)